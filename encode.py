@@ -1,47 +1,82 @@
 import torch
 from light_splade import SpladeEncoder
 from qdrant_client import models
+from scipy import sparse
 
 
-def encode_documents2points(encoder: SpladeEncoder, docs: list[str]) -> list[models.PointStruct]:
-    token2id: dict[str, int] = encoder.tokenizer.get_vocab()
+def load_encoder(model_path: str, half: bool = True, quantize: bool = False) -> SpladeEncoder:
+    encoder = SpladeEncoder(model_path=model_path)
 
-    # Encode documents to sparse vectors
+    # Half precision halves the memory traffic of the vocab-sized MLM head on GPU.
+    # This assumes FP16 rounding barely changes which terms survive the relu; logits
+    # near zero can flip, so pass half=False to keep FP32 when exact terms matter
+    if encoder.device == "cuda":
+        if half:
+            encoder.transformer.half()
+    # On CPU, optionally run the Linear layers (encoder + MLM head) as int8 GEMMs
+    elif quantize:
+        encoder.transformer = torch.ao.quantization.quantize_dynamic(
+            encoder.transformer, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    return encoder
+
+
+def _to_sparse_vectors(embeddings: sparse.csr_matrix) -> list[models.SparseVector]:
+    # CSR column indices of the (batch, vocab_size) SPLADE output are the vocab ids, so
+    # each row's slice of the indices/data buffers is already a Qdrant sparse vector
+    indices: list[int] = embeddings.indices.tolist()
+    values: list[float] = embeddings.data.tolist()
+    offsets: list[int] = embeddings.indptr.tolist()
+
+    # model_construct skips per-element Pydantic validation: the lists come straight
+    # from the encoder as unique ints and floats of equal length
+    return [
+        models.SparseVector.model_construct(indices=indices[start:end], values=values[start:end])
+        for start, end in zip(offsets, offsets[1:])
+    ]
+
+
+def encode_documents2points(encoder: SpladeEncoder, docs: list[str], batch_size: int = 32) -> models.Batch:
+    # SpladeEncoder.encode cannot stack zero CSR blocks, so skip the encoder for empty input
+    if not docs:
+        return models.Batch(ids=[], payloads=[], vectors={"text-sparse": []})
+
+    # Sort by length so each micro-batch pads to a similar length instead of its longest outlier
+    order: list[int] = sorted(range(len(docs)), key=lambda i: len(docs[i]))
+    inverse: list[int] = sorted(range(len(docs)), key=order.__getitem__)
+
+    # Encode documents to sparse vectors (micro-batched inside the encoder to bound memory)
     with torch.inference_mode():
-        embeddings: torch.Tensor = encoder.encode(docs)
-        sparse_vectors: list[dict[int, float]] = encoder.to_sparse(embeddings)
-
-    # Prepare points for Qdrant upsert
-    points = []
-    for i, (doc, sparse_vector) in enumerate(zip(docs, sparse_vectors)):
-        indices = []
-        values = []
-        for token, value in sparse_vector.items():
-            indices.append(token2id[token])
-            values.append(value)
-
-        point = models.PointStruct(
-            id=i,
-            payload={"text": doc},
-            vector={"text-sparse": models.SparseVector(indices=indices, values=values)},
+        embeddings: sparse.csr_matrix = encoder.encode(
+            [docs[i] for i in order], batch_size=batch_size, return_type="csr_matrix"
         )
-        points.append(point)
 
-    return points
+    sparse_vectors = _to_sparse_vectors(embeddings)
 
+    # Prepare a columnar batch for Qdrant upsert (one model instead of a PointStruct per document)
+    return models.Batch(
+        ids=list(range(len(docs))),
+        payloads=[{"text": doc} for doc in docs],
+        vectors={"text-sparse": [sparse_vectors[j] for j in inverse]},
+    )
 
-def encode_query2vector(encoder: SpladeEncoder, query: str) -> models.SparseVector:
-    token2id: dict[str, int] = encoder.tokenizer.get_vocab()
 
-    # Encode query to sparse vector
+def encode_queries2vectors(
+    encoder: SpladeEncoder, queries: list[str], batch_size: int = 32
+) -> list[models.SparseVector]:
+    # SpladeEncoder.encode cannot stack zero CSR blocks, so skip the encoder for empty input
+    if not queries:
+        return []
+
+    # Encode all queries to sparse vectors in one micro-batched call
     with torch.inference_mode():
-        query_embedding: torch.Tensor = encoder.encode([query])
-        query_sparse_vector: dict[int, float] = encoder.to_sparse(query_embedding)[0]
+        query_embeddings: sparse.csr_matrix = encoder.encode(
+            queries, batch_size=batch_size, return_type="csr_matrix"
+        )
+
+    return _to_sparse_vectors(query_embeddings)
 
-    indices = []
-    values = []
-    for token, value in query_sparse_vector.items():
-        indices.append(token2id[token])
-        values.append(value)
 
-    return models.SparseVector(indices=indices, values=values)
+def encode_query2vector(encoder: SpladeEncoder, query: str) -> models.SparseVector:
+    return encode_queries2vectors(encoder, [query])[0]
@@ -1,14 +1,14 @@
-from light_splade import SpladeEncoder
 from qdrant_client import QdrantClient, models
 
-from encode import encode_documents2points, encode_query2vector
+from encode import encode_documents2points, encode_queries2vectors, load_encoder
 from utils import show_results
 
 
 def main() -> None:
     # Initialize Qdrant client and SPLADE encoder
-    client = QdrantClient(url="http://localhost:6333")
-    encoder = SpladeEncoder(model_path="bizreach-inc/light-splade-japanese-28M")
+    # gRPC (port 6334) sends sparse vectors as protobuf instead of JSON arrays
+    client = QdrantClient(url="http://localhost:6333", prefer_grpc=True)
+    encoder = load_encoder(model_path="bizreach-inc/light-splade-japanese-28M")
 
     collection_name = "sparse_splade_collection"
     docs = [
@@ -21,14 +21,21 @@ def main() -> None:
 
     # Create collection
     # https://qdrant.tech/documentation/concepts/collections/#collection-with-sparse-vectors
-    client.create_collection(
-        collection_name=collection_name,
-        vectors_config={},
-        sparse_vectors_config={
-            "text-sparse": models.SparseVectorParams(),
-        },
-    )
-    print(f"Collection '{collection_name}' created.")
+    if client.collection_exists(collection_name=collection_name):
+        print(f"Collection '{collection_name}' already exists.")
+    else:
+        # Sparse-only collection: no dense vectors_config at all
+        client.create_collection(
+            collection_name=collection_name,
+            sparse_vectors_config={
+                # SPLADE weights survive half precision; float16 halves the index's value storage.
+                # Keep the inverted index in RAM for interactive queries.
+                "text-sparse": models.SparseVectorParams(
+                    index=models.SparseIndexParams(on_disk=False, datatype=models.Datatype.FLOAT16),
+                ),
+            },
+        )
+        print(f"Collection '{collection_name}' created.")
 
     # Upsert points
     # https://qdrant.tech/documentation/concepts/collections/#collection-with-sparse-vectors
@@ -37,21 +44,26 @@ def main() -> None:
         collection_name=collection_name,
         points=points,
     )
-    print(f"Upserted {len(points)} points.\n")
+    print(f"Upserted {len(points.ids)} points.\n")
 
-    # Search points
-    # https://qdrant.tech/documentation/concepts/search/#search-api
-    query = "ベクトル検索の仕組み"
-    query_sparse_vector = encode_query2vector(encoder, query)
-    print(f"query: '{query}'\n")
+    # Search points (all queries in a single request)
+    # https://qdrant.tech/documentation/concepts/search/#batch-search-api
+    queries = [
+        "ベクトル検索の仕組み",
+        "Qdrant の使い方",
+    ]
+    query_sparse_vectors = encode_queries2vectors(encoder, queries)
 
-    search_result: models.QueryResponse = client.query_points(
+    search_results: list[models.QueryResponse] = client.query_batch_points(
         collection_name=collection_name,
-        query=query_sparse_vector,
-        using="text-sparse",
-        limit=3,
+        requests=[
+            models.QueryRequest(query=query_sparse_vector, using="text-sparse", limit=3)
+            for query_sparse_vector in query_sparse_vectors
+        ],
     )
-    show_results(search_result.points)
+    for query, search_result in zip(queries, search_results):
+        print(f"query: '{query}'\n")
+        show_results(search_result.points)
 
     # Delete collection
     client.delete_collection(collection_name=collection_name)